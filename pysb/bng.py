@@ -1,11 +1,12 @@
-from __future__ import absolute_import
-from __future__ import print_function as _
 import pysb.core
 from pysb.generator.bng import BngGenerator, format_complexpattern
 import os
 import subprocess
 import re
+import hashlib
 import itertools
+import selectors
+import threading
 import sympy
 import sympy.parsing.sympy_parser as sympy_parser
 import numpy
@@ -18,21 +19,13 @@ from collections.abc import Sequence
 import pysb.pathfinder as pf
 import tokenize
 from pysb.logging import get_logger, EXTENDED_DEBUG
-from sympy.logic.boolalg import BooleanTrue, BooleanFalse, BooleanAtom
+from sympy.logic.boolalg import (Boolean, BooleanTrue, BooleanFalse,
+                                 BooleanAtom)
+from io import StringIO
 try:
-    from cStringIO import StringIO
+    import pandas as pd
 except ImportError:
-    from io import StringIO
-try:
-    from future_builtins import zip
-except ImportError:
-    pass
-
-# Alias basestring under Python 3 for forwards compatibility
-try:
-    basestring
-except NameError:
-    basestring = str
+    pd = None
 
 
 def set_bng_path(dir):
@@ -48,9 +41,81 @@ class BngInterfaceError(RuntimeError):
     pass
 
 
-class BngBaseInterface(object):
+def _load_results_table(source, skiprows=0):
+    """
+    Read a whitespace-delimited BNG results table (.cdat/.gdat) as a 2D
+    float array
+
+    Uses the pandas C parser when pandas is available, which is much faster
+    than numpy.loadtxt on long trajectories; falls back to numpy.loadtxt
+    otherwise.
+
+    Parameters
+    ----------
+    source : str or file-like
+        Filename or open file object to read the table from
+    skiprows : int, optional
+        Number of leading (header) lines to skip
+    """
+    if pd is None:
+        return numpy.loadtxt(source, skiprows=skiprows, ndmin=2)
+    try:
+        return pd.read_csv(source, sep=r'\s+', engine='c', header=None,
+                           skiprows=skiprows,
+                           dtype=numpy.float64).values
+    except pd.errors.EmptyDataError:
+        return numpy.empty((0, 0))
+
+
+def _stream_stdout_lines(proc, err_buf):
+    """
+    Yield decoded stdout lines from a subprocess as they arrive
+
+    stderr is drained concurrently into `err_buf` (a bytearray), so neither
+    pipe can fill up and block the child process, no matter how much output
+    it produces. On POSIX both pipes are multiplexed with selectors; on
+    Windows, where select() does not support pipes, stderr is drained by a
+    reader thread instead.
+    """
+    if os.name == 'posix':
+        sel = selectors.DefaultSelector()
+        try:
+            sel.register(proc.stdout, selectors.EVENT_READ)
+            sel.register(proc.stderr, selectors.EVENT_READ)
+            pending = bytearray()
+            while sel.get_map():
+                for sel_key, _ in sel.select():
+                    data = os.read(sel_key.fd, 65536)
+                    if not data:
+                        sel.unregister(sel_key.fileobj)
+                        sel_key.fileobj.close()
+                        continue
+                    if sel_key.fileobj is proc.stderr:
+                        err_buf.extend(data)
+                        continue
+                    pending.extend(data)
+                    lines = pending.split(b'\n')
+                    pending = lines.pop()
+                    for line in lines:
+                        yield line.decode('utf-8', 'replace')
+        finally:
+            sel.close()
+        if pending:
+            yield pending.decode('utf-8', 'replace')
+    else:
+        def _drain_stderr():
+            for chunk in iter(lambda: proc.stderr.read(65536), b''):
+                err_buf.extend(chunk)
+        stderr_thread = threading.Thread(target=_drain_stderr)
+        stderr_thread.daemon = True
+        stderr_thread.start()
+        for line in iter(proc.stdout.readline, b''):
+            yield line[:-1].decode('utf-8', 'replace')
+        stderr_thread.join()
+
+
+class BngBaseInterface(metaclass=abc.ABCMeta):
     """ Abstract base class for interfacing with BNG """
-    __metaclass__ = abc.ABCMeta
 
     @abc.abstractmethod
     def __init__(self, model=None, verbose=False, cleanup=False,
@@ -89,7 +154,7 @@ class BngBaseInterface(object):
         return
 
     def _delete_tmpdir(self):
-        shutil.rmtree(self.base_directory)
+        shutil.rmtree(self.base_directory, ignore_errors=True)
 
     def _check_model(self):
         """
@@ -117,7 +182,7 @@ class BngBaseInterface(object):
         param :
             An argument to a BNG action call
         """
-        if isinstance(param, basestring):
+        if isinstance(param, str):
             return '"%s"' % param
         elif isinstance(param, bool):
             return 1 if param else 0
@@ -229,7 +294,8 @@ class BngBaseInterface(object):
 
             # Read concentrations data
             try:
-                cdat_arr = numpy.loadtxt(base_filename + '.cdat', skiprows=1, ndmin=2)
+                cdat_arr = _load_results_table(base_filename + '.cdat',
+                                               skiprows=1)
                 # -1 for time column
                 names += ['__s%d' % i for i in range(cdat_arr.shape[1] - 1)]
             except IOError:
@@ -241,7 +307,7 @@ class BngBaseInterface(object):
                     # Exclude \# and time column
                     names += f.readline().split()[2:]
                     # Exclude first column (time)
-                    gdat_arr = numpy.loadtxt(f, ndmin=2)
+                    gdat_arr = _load_results_table(f)
                     if cdat_arr is None:
                         cdat_arr = numpy.ndarray((len(gdat_arr), 0))
                     else:
@@ -444,7 +510,7 @@ class BngFileInterface(BngBaseInterface):
                 output += self.generator.get_content()
             if reload_netfile:
                 filename = reload_netfile if \
-                    isinstance(reload_netfile, basestring) \
+                    isinstance(reload_netfile, str) \
                     else self.net_filename
                 output += '\n  readFile({file=>"%s",skip_actions=>%d})\n' \
                     % (filename, int(skip_file_actions))
@@ -471,8 +537,8 @@ class BngFileInterface(BngBaseInterface):
         # output lines as DEBUG, unless a warning or error is encountered
         capture_error = False
         captured_error_lines = []
-        for line in iter(p.stdout.readline, b''):
-            line = line[:-1].decode('utf-8')
+        err_buf = bytearray()
+        for line in _stream_stdout_lines(p, err_buf):
             if line.startswith('ERROR:'):
                 capture_error = True
             if capture_error:
@@ -480,9 +546,8 @@ class BngFileInterface(BngBaseInterface):
 
             self._logger.debug(line)
 
-        # p_out is already consumed, so only get p_err
-        (_, p_err) = p.communicate()
-        p_err = p_err.decode('utf-8')
+        p.wait()
+        p_err = bytes(err_buf).decode('utf-8')
         if p.returncode or captured_error_lines:
             raise BngInterfaceError('\n'.join(captured_error_lines) + "\n" +
                                     p_err.rstrip())
@@ -535,7 +600,7 @@ class BngFileInterface(BngBaseInterface):
             Initial concentration
 
         """
-        if isinstance(cplx_pat, basestring):
+        if isinstance(cplx_pat, str):
             formatted_name = cplx_pat
         else:
             formatted_name = format_complexpattern(
@@ -545,6 +610,26 @@ class BngFileInterface(BngBaseInterface):
             formatted_name, value))
 
 
+# Memoized results of BNG network generation, keyed by a digest of the BNGL
+# file contents and the generate_network arguments. Populated by
+# generate_network() and cleared with clear_network_cache().
+_network_cache = {}
+
+
+def _network_cache_key(bngl_content, action_kwargs):
+    """ Return a cache key for a network generation run """
+    digest = hashlib.blake2b(bngl_content.encode('utf8')).hexdigest()
+    # repr() makes unhashable argument values (e.g. lists) usable as part
+    # of the key
+    return digest, tuple(sorted((k, repr(v))
+                                for k, v in action_kwargs.items()))
+
+
+def clear_network_cache():
+    """ Clear the cache of BNG network generation results """
+    _network_cache.clear()
+
+
 def generate_hybrid_model(model, population_maps, additional_species=None,
                           safe=False, verbose=False, output_dir=None,
                           output_prefix=None, cleanup=True):
@@ -630,7 +715,7 @@ def run_ssa(model, t_end=10, n_steps=100, param_values=None, output_dir=None,
 
         # Parse netfile (in case this hasn't already been done)
         if not model.species:
-            _parse_netfile(model, iter(output.split('\n')))
+            _parse_netfile(model, output)
 
         yfull = bngfile.read_simulation_results()
 
@@ -662,17 +747,33 @@ def generate_network(model, cleanup=True, append_stdout=False,
         constants from Python's logging module for interpretation of integer
         values. False is equal to the PySB default level (currently WARNING),
         True is equal to DEBUG.
+
+    Notes
+    -----
+    Results are memoized on the generated BNGL file contents, so repeated
+    calls with an unchanged model skip the (potentially expensive) call out
+    to BNG. Use :func:`clear_network_cache` to discard the memoized results.
     """
     bng_action_debug = verbose if isinstance(verbose, bool) else \
         verbose <= EXTENDED_DEBUG
 
     with BngFileInterface(model, verbose=verbose, cleanup=cleanup) as bngfile:
+        cache_key = _network_cache_key(bngfile.generator.get_content(),
+                                       dict(kwargs, verbose=bng_action_debug))
+        try:
+            output = _network_cache[cache_key]
+            bngfile._logger.debug('Reaction network retrieved from cache')
+            return output
+        except KeyError:
+            pass
+
         bngfile._logger.info('Generating reaction network')
         bngfile.action('generate_network', overwrite=True,
                        verbose=bng_action_debug, **kwargs)
         bngfile.execute()
 
         output = bngfile.read_netfile()
+        _network_cache[cache_key] = output
 
     return output
 
@@ -695,7 +796,7 @@ def load_equations(model, netfile):
     if model.reactions:
         return
     with open(netfile, 'r') as f:
-        _parse_netfile(model, f)
+        _parse_netfile(model, f.read())
 
 
 def generate_equations(model, cleanup=True, verbose=False, **kwargs):
@@ -729,54 +830,51 @@ def generate_equations(model, cleanup=True, verbose=False, **kwargs):
     #   or, use a separate "math model" object to contain ODEs
     if model.reactions:
         return
-    lines = iter(generate_network(model, cleanup=cleanup,
-                                  verbose=verbose, **kwargs).split('\n'))
-    _parse_netfile(model, lines)
+    _parse_netfile(model, generate_network(model, cleanup=cleanup,
+                                           verbose=verbose, **kwargs))
+
+
+# Extracts the body of each net file section of interest in a single pass
+_net_sections = re.compile(
+    r'^begin (parameters|species|reactions|groups)\n(.*?)^end \1$',
+    re.MULTILINE | re.DOTALL)
 
 
-def _parse_netfile(model, lines):
+def _parse_netfile(model, netfile_text):
     """ Parse species, rxns and groups from a BNGL net file """
-    try:
-        while 'begin parameters' not in next(lines):
-            pass
-        while True:
-            line = next(lines)
-            if 'end parameters' in line: break
-            _parse_parameter(model, line)
+    sections = {m.group(1): m.group(2).splitlines()
+                for m in _net_sections.finditer(netfile_text)}
 
-        while 'begin species' not in next(lines):
-            pass
+    for line in sections.get('parameters', ()):
+        _parse_parameter(model, line)
+
+    if 'species' in sections:
         model.species = []
-        while True:
-            line = next(lines)
-            if 'end species' in line: break
+        for line in sections['species']:
             _parse_species(model, line)
 
-        while 'begin reactions' not in next(lines):
-            pass
-
+    if 'reactions' in sections:
+        # Pre-build species symbols once; creating (or sympifying) them anew
+        # for every reactant of every reaction is surprisingly expensive on
+        # large networks
+        species_syms = [sympy.Symbol('__s%d' % i)
+                        for i in range(len(model.species))]
         reaction_cache = {}
-        while True:
-            line = next(lines)
-            if 'end reactions' in line: break
-            _parse_reaction(model, line, reaction_cache=reaction_cache)
-        # fix up reactions whose reverse version we saw first
+        for line in sections['reactions']:
+            _parse_reaction(model, line, reaction_cache, species_syms)
+        # sum up each bidirectional reaction's accumulated rate terms in one
+        # go (repeated += on a growing sympy.Add is quadratic), and fix up
+        # reactions whose reverse version we saw first
         for r in model.reactions_bidirectional:
+            r['rate'] = sympy.Add(*r['rate'])
             if all(r['reverse']):
                 r['reactants'], r['products'] = r['products'], r['reactants']
                 r['rate'] *= -1
             # now the 'reverse' value is no longer needed
             del r['reverse']
 
-        while 'begin groups' not in next(lines):
-            pass
-        while True:
-            line = next(lines)
-            if 'end groups' in line: break
-            _parse_group(model, line)
-
-    except StopIteration as e:
-        pass
+    for line in sections.get('groups', ()):
+        _parse_group(model, line)
 
 
 def _parse_parameter(model, line):
@@ -799,17 +897,25 @@ def _parse_parameter(model, line):
                 ptype, pname))
 
 
+# Patterns used on every species/reaction line of a net file; compiled once
+# here rather than per call
+_species_pattern = re.compile(r'(?:@(\w+)::)?(.*)')
+_monomer_pattern = re.compile(r'\$?(\w+)\(([^)]*)\)(?:@(\w+))?')
+_rule_pattern = re.compile(r'#([\w,\(\)]+)(?: unit_conversion=(.*))?\s*$')
+_reverse_rule_pattern = re.compile(r'^_reverse_|\(reverse\)$')
+
+
 def _parse_species(model, line):
     """Parse a 'species' line from a BNGL net file."""
     index, species, value = line.strip().split()
     species_compartment_name, complex_string = \
-        re.match(r'(?:@(\w+)::)?(.*)', species).groups()
+        _species_pattern.match(species).groups()
     species_compartment = model.compartments.get(species_compartment_name)
     monomer_strings = complex_string.split('.')
     monomer_patterns = []
     for ms in monomer_strings:
         monomer_name, site_strings, monomer_compartment_name = \
-            re.match(r'\$?(\w+)\(([^)]*)\)(?:@(\w+))?', ms).groups()
+            _monomer_pattern.match(ms).groups()
         site_conditions = collections.defaultdict(list)
         if len(site_strings):
             for ss in site_strings.split(','):
@@ -850,27 +956,26 @@ def _parse_species(model, line):
     model.species.append(cp)
 
 
-def _parse_reaction(model, line, reaction_cache):
+def _parse_reaction(model, line, reaction_cache, species_syms):
     """Parse a 'reaction' line from a BNGL net file."""
     (number, reactants, products, rate, rule) = line.strip().split(' ', 4)
     # the -1 is to switch from one-based to zero-based indexing
     reactants = tuple(int(r) - 1 for r in reactants.split(',') if r != '0')
     products = tuple(int(p) - 1 for p in products.split(',') if p != '0')
     rate = rate.rsplit('*')
-    (rule_list, unit_conversion) = re.match(
-        r'#([\w,\(\)]+)(?: unit_conversion=(.*))?\s*$',
-        rule).groups()
+    (rule_list, unit_conversion) = _rule_pattern.match(rule).groups()
     rule_list = rule_list.split(',')  # BNG lists all rules that generate a rxn
     # Support new (BNG 2.2.6-stable or greater) and old BNG naming convention
     # for reverse rules
-    rule_name, is_reverse = zip(*[re.subn('^_reverse_|\(reverse\)$', '', r)
+    rule_name, is_reverse = zip(*[_reverse_rule_pattern.subn('', r)
                                   for r in rule_list])
     is_reverse = tuple(bool(i) for i in is_reverse)
-    r_names = ['__s%d' % r for r in reactants]
+    reactant_syms = [species_syms[r] for r in reactants]
     rate_param = [model.parameters.get(r) or model.expressions.get(r) or
                   model._derived_parameters.get(r) or
                   model._derived_expressions.get(r) or float(r) for r in rate]
-    combined_rate = sympy.Mul(*[sympy.S(t) for t in r_names + rate_param])
+    combined_rate = sympy.Mul(
+        *(reactant_syms + [sympy.S(t) for t in rate_param]))
     reaction = {
         'reactants': reactants,
         'products': products,
@@ -879,23 +984,25 @@ def _parse_reaction(model, line, reaction_cache):
         'reverse': is_reverse,
         }
     model.reactions.append(reaction)
-    # bidirectional reactions
+    # bidirectional reactions; rates are accumulated as lists of terms here
+    # and summed into a single expression in _parse_netfile once all
+    # reactions have been seen
     key = (reactants, products)
     key_reverse = (products, reactants)
     if key in reaction_cache:
         reaction_bd = reaction_cache.get(key)
-        reaction_bd['rate'] += combined_rate
+        reaction_bd['rate'].append(combined_rate)
         reaction_bd['rule'] += tuple(r for r in rule_name if r not in
                                      reaction_bd['rule'])
     elif key_reverse in reaction_cache:
         reaction_bd = reaction_cache.get(key_reverse)
         reaction_bd['reversible'] = True
-        reaction_bd['rate'] -= combined_rate
+        reaction_bd['rate'].append(-combined_rate)
         reaction_bd['rule'] += tuple(r for r in rule_name if r not in
                                      reaction_bd['rule'])
     else:
         # make a copy of the reaction dict
-        reaction_bd = dict(reaction)
+        reaction_bd = dict(reaction, rate=[combined_rate])
         # default to false until we find a matching reverse reaction
         reaction_bd['reversible'] = False
         reaction_cache[key] = reaction_bd
@@ -934,7 +1041,7 @@ def _convert_tokens(tokens, local_dict, global_dict):
 
 
 def _is_bool_expr(e):
-    return isinstance(e, sympy.boolalg.Boolean) and not \
+    return isinstance(e, Boolean) and not \
         isinstance(e, sympy.AtomicExpr)
 
 
@@ -1879,6 +1879,7 @@ class Model(object):
         # in a cross-Python-version-compatible way. Since it's regenerated on
         # demand anyway, we can just clear it here.
         state['_stoichiometry_matrix'] = None
+        state['_observables_matrix'] = None
         return state
 
     def __setstate__(self, state):
@@ -2019,18 +2020,53 @@ class Model(object):
     def stoichiometry_matrix(self):
         """Return the stoichiometry matrix for the reaction network."""
         if self._stoichiometry_matrix is None:
-            shape = (len(self.species), len(self.reactions))
-            sm = scipy.sparse.lil_matrix(shape, dtype='int')
+            # Build the matrix in one shot from (row, col, value) triples;
+            # duplicate entries (repeated reactants/products) are summed by
+            # the COO constructor, and fixed species simply contribute no
+            # triples, leaving their rows zero. This avoids incremental
+            # sparse-matrix assignment, which is slow on large networks.
+            fixed = {i for i, ic in enumerate(self.initials) if ic.fixed}
+            rows = []
+            cols = []
+            data = []
             for i, reaction in enumerate(self.reactions):
                 for r in reaction['reactants']:
-                    sm[r, i] -= 1
+                    if r not in fixed:
+                        rows.append(r)
+                        cols.append(i)
+                        data.append(-1)
                 for p in reaction['products']:
-                    sm[p, i] += 1
-            fixed = [i for i, ic in enumerate(self.initials) if ic.fixed]
-            sm[fixed, :] = 0
-            self._stoichiometry_matrix = sm.tocsr()
+                    if p not in fixed:
+                        rows.append(p)
+                        cols.append(i)
+                        data.append(1)
+            shape = (len(self.species), len(self.reactions))
+            self._stoichiometry_matrix = scipy.sparse.coo_matrix(
+                (data, (rows, cols)), shape=shape, dtype='int').tocsr()
         return self._stoichiometry_matrix
 
+    @property
+    def observables_matrix(self):
+        """Return the observables coefficient matrix for the network.
+
+        The matrix has one row per observable and one column per species,
+        with entries giving the coefficient by which each species amount
+        contributes to the observable, so all observable values can be
+        computed at once as ``observables_matrix @ y``.
+        """
+        if self._observables_matrix is None:
+            rows = []
+            cols = []
+            data = []
+            for i, obs in enumerate(self.observables):
+                rows.extend([i] * len(obs.species))
+                cols.extend(obs.species)
+                data.extend(obs.coefficients)
+            shape = (len(self.observables), len(self.species))
+            self._observables_matrix = scipy.sparse.coo_matrix(
+                (data, (rows, cols)), shape=shape, dtype='int').tocsr()
+        return self._observables_matrix
+
     def add_component(self, other):
         """Add a component to the model."""
         # We have a container for each type of component. This code determines
@@ -2176,6 +2212,7 @@ class Model(object):
         self.reactions = []
         self.reactions_bidirectional = []
         self._stoichiometry_matrix = None
+        self._observables_matrix = None
         self._derived_parameters = ComponentSet()
         self._derived_expressions = ComponentSet()
         for obs in self.observables:
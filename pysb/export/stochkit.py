@@ -8,19 +8,17 @@ For information on how to use the model exporters, see the documentation
 for :py:mod:`pysb.export`.
 """
 from pysb.export import Exporter, CompartmentsNotSupported
-from pysb.core import as_complex_pattern, Expression, Parameter
+from pysb.core import as_complex_pattern, Parameter
 from pysb.bng import generate_equations
 import numpy as np
 import sympy
-import re
-from collections import defaultdict
+from collections import Counter
 import itertools
 try:
     import lxml.etree as etree
     pretty_print = True
 except ImportError:
     import xml.etree.ElementTree as etree
-    import xml.dom.minidom
     pretty_print = False
 
 
@@ -31,76 +29,45 @@ class StochKitExporter(Exporter):
     basic functionality for all exporters.
     """
     @staticmethod
-    def _species_to_element(species_num, species_val):
-        e = etree.Element('Species')
-        idElement = etree.Element('Id')
-        idElement.text = species_num
-        e.append(idElement)
-
-        initialPopulationElement = etree.Element('InitialPopulation')
-        initialPopulationElement.text = str(species_val)
-        e.append(initialPopulationElement)
-
+    def _species_to_element(parent, species_num, species_val):
+        e = etree.SubElement(parent, 'Species')
+        etree.SubElement(e, 'Id').text = species_num
+        etree.SubElement(e, 'InitialPopulation').text = str(species_val)
         return e
 
-
     @staticmethod
-    def _parameter_to_element(param_name, param_val):
-        e = etree.Element('Parameter')
-        idElement = etree.Element('Id')
-        idElement.text = param_name
-        e.append(idElement)
-        expressionElement = etree.Element('Expression')
-        expressionElement.text = str(param_val)
-        e.append(expressionElement)
+    def _parameter_to_element(parent, param_name, param_val):
+        e = etree.SubElement(parent, 'Parameter')
+        etree.SubElement(e, 'Id').text = param_name
+        etree.SubElement(e, 'Expression').text = str(param_val)
         return e
 
-
     @staticmethod
-    def _reaction_to_element(rxn_name, rxn_desc, propensity_fxn, reactants,
-                             products):
-        e = etree.Element('Reaction')
+    def _reaction_to_element(parent, rxn_name, rxn_desc, propensity_fxn,
+                             reactants, products):
+        e = etree.SubElement(parent, 'Reaction')
 
-        idElement = etree.Element('Id')
-        idElement.text = rxn_name
-        e.append(idElement)
+        etree.SubElement(e, 'Id').text = rxn_name
+        etree.SubElement(e, 'Description').text = rxn_desc
 
-        descriptionElement = etree.Element('Description')
-        descriptionElement.text = rxn_desc
-        e.append(descriptionElement)
-
-        typeElement = etree.Element('Type')
         if isinstance(propensity_fxn, (Parameter, float)):
-            typeElement.text = 'mass-action'
-            e.append(typeElement)
-            rateElement = etree.Element('Rate')
-            rateElement.text = propensity_fxn.name if isinstance(
-                propensity_fxn, Parameter) else str(propensity_fxn)
-            e.append(rateElement)
+            etree.SubElement(e, 'Type').text = 'mass-action'
+            etree.SubElement(e, 'Rate').text = propensity_fxn.name \
+                if isinstance(propensity_fxn, Parameter) \
+                else str(propensity_fxn)
         else:
-            typeElement.text = 'customized'
-            e.append(typeElement)
-            functionElement = etree.Element('PropensityFunction')
-            functionElement.text = propensity_fxn
-            e.append(functionElement)
-
-        reactantElement = etree.Element('Reactants')
+            etree.SubElement(e, 'Type').text = 'customized'
+            etree.SubElement(e, 'PropensityFunction').text = propensity_fxn
 
+        reactantElement = etree.SubElement(e, 'Reactants')
         for reactant, stoichiometry in reactants.items():
-            srElement = etree.Element('SpeciesReference')
-            srElement.set('id', reactant)
-            srElement.set('stoichiometry', str(stoichiometry))
-            reactantElement.append(srElement)
+            etree.SubElement(reactantElement, 'SpeciesReference',
+                             id=reactant, stoichiometry=str(stoichiometry))
 
-        e.append(reactantElement)
-
-        productElement = etree.Element('Products')
+        productElement = etree.SubElement(e, 'Products')
         for product, stoichiometry in products.items():
-            srElement = etree.Element('SpeciesReference')
-            srElement.set('id', product)
-            srElement.set('stoichiometry', str(stoichiometry))
-            productElement.append(srElement)
-        e.append(productElement)
+            etree.SubElement(productElement, 'SpeciesReference',
+                             id=product, stoichiometry=str(stoichiometry))
 
         return e
 
@@ -129,20 +96,16 @@ class StochKitExporter(Exporter):
         generate_equations(self.model)
         document = etree.Element("Model")
 
-        d = etree.Element('Description')
-
-        d.text = 'Exported from PySB Model: %s' % self.model.name
-        document.append(d)
+        etree.SubElement(document, 'Description').text = \
+            'Exported from PySB Model: %s' % self.model.name
 
         # Number of Reactions
-        nr = etree.Element('NumberOfReactions')
-        nr.text = str(len(self.model.reactions))
-        document.append(nr)
+        etree.SubElement(document, 'NumberOfReactions').text = \
+            str(len(self.model.reactions))
 
         # Number of Species
-        ns = etree.Element('NumberOfSpecies')
-        ns.text = str(len(self.model.species))
-        document.append(ns)
+        etree.SubElement(document, 'NumberOfSpecies').text = \
+            str(len(self.model.species))
 
         if param_values is None:
             # Get parameter values from model if not supplied
@@ -190,14 +153,12 @@ class StochKitExporter(Exporter):
                                 'model.species')
 
         # Species
-        spec = etree.Element('SpeciesList')
+        spec = etree.SubElement(document, 'SpeciesList')
         for s_id in range(len(self.model.species)):
-            spec.append(self._species_to_element('__s%d' % s_id,
-                                                 initials[s_id]))
-        document.append(spec)
+            self._species_to_element(spec, '__s%d' % s_id, initials[s_id])
 
         # Parameters
-        params = etree.Element('ParametersList')
+        params = etree.SubElement(document, 'ParametersList')
         for p_id, param in enumerate(itertools.chain(
                 self.model.parameters, self.model._derived_parameters)):
             p_name = param.name
@@ -205,17 +166,15 @@ class StochKitExporter(Exporter):
                 p_name = '__vol'
             p_value = param.value if param_values is None else \
                 param_values[p_id]
-            params.append(self._parameter_to_element(p_name, p_value))
+            self._parameter_to_element(params, p_name, p_value)
         # Default volume parameter value
-        params.append(self._parameter_to_element('vol', 1.0))
+        self._parameter_to_element(params, 'vol', 1.0)
 
-        document.append(params)
-
-        # Expressions and observables
-        expr_strings = {
-            e.name: '(%s)' % sympy.ccode(
-                e.expand_expr(expand_observables=True)
-            )
+        # Symbolic replacements expanding each expression in terms of
+        # parameters and species; applied to reaction rates with a single
+        # xreplace below rather than one regex pass per expression
+        expr_subs = {
+            e: e.expand_expr(expand_observables=True)
             for e in itertools.chain(
                 self.model.expressions_constant(),
                 self.model.expressions_dynamic(include_local=False),
@@ -224,37 +183,13 @@ class StochKitExporter(Exporter):
         }
 
         # Reactions
-        reacs = etree.Element('ReactionsList')
-        pattern = re.compile("(__s\d+)\*\*(\d+)")
+        reacs = etree.SubElement(document, 'ReactionsList')
         for rxn_id, rxn in enumerate(self.model.reactions):
             rxn_name = 'Rxn%d' % rxn_id
             rxn_desc = 'Rules: %s' % str(rxn["rule"])
 
-            reactants = defaultdict(int)
-            products = defaultdict(int)
-            # reactants
-            for r in rxn["reactants"]:
-                reactants["__s%d" % r] += 1
-            # products
-            for p in rxn["products"]:
-                products["__s%d" % p] += 1
-            # replace terms like __s**2 with __s*(__s-1)
-            rate = str(rxn["rate"])
-
-            matches = pattern.findall(rate)
-            for m in matches:
-                repl = m[0]
-                for i in range(1, int(m[1])):
-                    repl += "*(%s-%d)" % (m[0], i)
-                rate = re.sub(pattern, repl, rate, count=1)
-
-            # expand only expressions used in the rate eqn
-            for e in {sym for sym in rxn["rate"].atoms()
-                      if isinstance(sym, Expression)}:
-                rate = re.sub(r'\b%s\b' % e.name,
-                              expr_strings[e.name],
-                              rate)
-
+            reactants = Counter('__s%d' % r for r in rxn["reactants"])
+            products = Counter('__s%d' % p for p in rxn["products"])
             total_reactants = sum(reactants.values())
             rxn_params = rxn["rate"].atoms(Parameter)
             rate = None
@@ -288,40 +223,30 @@ class StochKitExporter(Exporter):
             if rate is None:
                 # Custom propensity function needed
 
-                rxn_atoms = rxn["rate"].atoms()
-
-                # replace terms like __s**2 with __s*(__s-1)
-                rate = str(rxn["rate"])
-
-                matches = pattern.findall(rate)
-                for m in matches:
-                    repl = m[0]
-                    for i in range(1, int(m[1])):
-                        repl += "*(%s-%d)" % (m[0], i)
-                    rate = re.sub(pattern, repl, rate, count=1)
-
-                # expand only expressions used in the rate eqn
-                for e in {sym for sym in rxn_atoms
-                          if isinstance(sym, Expression)}:
-                    rate = re.sub(r'\b%s\b' % e.name,
-                                  expr_strings[e.name],
-                                  rate)
-
-            reacs.append(self._reaction_to_element(rxn_name,
-                                                   rxn_desc,
-                                                   rate,
-                                                   reactants,
-                                                   products))
-        document.append(reacs)
+                # Rewrite species multiplicities like __s0**2 as
+                # __s0*(__s0-1) before expressions are expanded, so that
+                # powers written explicitly within expressions are left alone
+                sym_rate = rxn["rate"].replace(
+                    lambda expr: (expr.is_Pow and expr.base.is_Symbol and
+                                  expr.base.name.startswith('__s') and
+                                  expr.exp.is_Integer and expr.exp > 1),
+                    lambda expr: sympy.Mul(
+                        *[expr.base - i for i in range(int(expr.exp))],
+                        evaluate=False)
+                )
+                # Expand expressions (and observables within them) in a
+                # single symbolic substitution, then generate the propensity
+                # string with one ccode call. Skip the substitution walk
+                # entirely for expression-free models.
+                if expr_subs:
+                    sym_rate = sym_rate.xreplace(expr_subs)
+                rate = sympy.ccode(sym_rate)
+
+            self._reaction_to_element(reacs, rxn_name, rxn_desc, rate,
+                                      reactants, products)
 
         if pretty_print:
             return etree.tostring(document, pretty_print=True).decode('utf8')
         else:
-            # Hack to print pretty xml without pretty-print
-            # (requires the lxml module).
-            doc = etree.tostring(document)
-            xmldoc = xml.dom.minidom.parseString(doc)
-            uglyXml = xmldoc.toprettyxml(indent='  ')
-            text_re = re.compile(">\n\s+([^<>\s].*?)\n\s+</", re.DOTALL)
-            prettyXml = text_re.sub(">\g<1></", uglyXml)
-            return prettyXml
+            etree.indent(document, space='  ')
+            return etree.tostring(document, encoding='unicode') + '\n'
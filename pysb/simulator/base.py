@@ -852,16 +852,17 @@ class SimulationResult(object):
             sym_names = obs_names + param_names
             expanded_exprs = [sympy.lambdify(sym_names, expr.expand_expr(),
                                              "numpy") for expr in exprs]
+            obs_matrix = self._model.observables_matrix
             for n in range(self.nsims):
                 if simulator:
                     simulator._logger.log(EXTENDED_DEBUG,
                                           'Evaluating exprs/obs %d/%d'
                                           % (n + 1, self.nsims))
 
-                # observables
-                for i, obs in enumerate(model_obs):
-                    self._yobs_view[n][:, i] = (
-                        self._y[n][:, obs.species] * obs.coefficients).sum(axis=1)
+                # observables, all at once as a sparse matrix-matrix product
+                if model_obs:
+                    self._yobs_view[n][:, :] = obs_matrix.dot(
+                        self._y[n].T).T
 
                 # expressions
                 sym_dict = dict((k, self._yobs[n][k]) for k in obs_names)
@@ -4,6 +4,10 @@ try:
     import Cython
 except ImportError:
     Cython = None
+try:
+    import numba
+except ImportError:
+    numba = None
 from sympy.printing.lambdarepr import lambdarepr
 import distutils
 import pysb.bng
@@ -12,6 +16,7 @@ import re
 from functools import partial
 import numpy as np
 import warnings
+import math
 import os
 from pysb.logging import get_logger, EXTENDED_DEBUG
 import logging
@@ -66,10 +71,11 @@ class ScipyOdeSimulator(Simulator):
         * ``integrator_options``: A dictionary of keyword arguments to
           supply to the integrator. See :func:`scipy.integrate.ode`.
         * ``compiler``: Choice of compiler for ODE system: ``cython``,
-          or ``python``. Leave unspecified or equal to None for auto-select
-          (tries cython, then python). Cython compiles the
-          equation system into C code. Python is the slowest but most
-          compatible.
+          ``numba`` or ``python``. Leave unspecified or equal to None for
+          auto-select (tries cython, then python). Cython compiles the
+          equation system into C code. Numba JIT-compiles the equation
+          system with LLVM (requires the 'numba' package). Python is the
+          slowest but most compatible.
         * ``cleanup``: Boolean, `cleanup` argument used for
           :func:`pysb.bng.generate_equations` call
 
@@ -157,7 +163,9 @@ class ScipyOdeSimulator(Simulator):
                           e in self._model.expressions}
         self._eqn_subs.update({e: e.expand_expr(expand_observables=True) for
                                e in self._model._derived_expressions})
-        ode_mat = sympy.Matrix(self.model.odes).subs(self._eqn_subs)
+        # model.odes are assembled with deferred evaluation; doit() collapses
+        # trivial terms (0*x, -1*x) before code generation and CSE
+        ode_mat = sympy.Matrix(self.model.odes).subs(self._eqn_subs).doit()
 
         if compiler_mode is None:
             self._compiler = self._autoselect_compiler()
@@ -174,34 +182,53 @@ class ScipyOdeSimulator(Simulator):
 
         self._compiler_directives = None
 
-        # Use lambdarepr (Python code) with Cython, otherwise use C code
-        eqn_repr = lambdarepr if self._compiler == 'cython' else sympy.ccode
-
-        if self._compiler == 'cython':
-            # Prepare the string representations of the RHS equations
-
-            code_eqs = '\n'.join(['ydot[%d] = %s;' %
-                                  (i, eqn_repr(o))
-                                  for i, o in enumerate(ode_mat)])
+        # Use lambdarepr (Python code) with Cython and Numba, otherwise use
+        # C code
+        eqn_repr = lambdarepr if self._compiler in ('cython', 'numba') \
+            else sympy.ccode
+
+        if self._compiler in ('cython', 'numba'):
+            # Prepare the string representations of the RHS equations,
+            # hoisting subexpressions shared between ODEs (rules with similar
+            # patterns produce rates with heavy substructure sharing) so they
+            # are only evaluated once per RHS call. The '_cse' symbol prefix
+            # avoids clashes with model component names.
+            cse_subs, ode_mat_reduced = sympy.cse(
+                ode_mat, symbols=sympy.numbered_symbols('_cse'))
+            code_eqs = '\n'.join(
+                ['%s = %s;' % (sym.name, eqn_repr(expr))
+                 for sym, expr in cse_subs] +
+                ['ydot[%d] = %s;' % (i, eqn_repr(o))
+                 for i, o in enumerate(ode_mat_reduced[0])])
             code_eqs = str(self._eqn_substitutions(code_eqs))
 
             # Allocate ydot here, once.
             ydot = np.zeros(len(self.model.species))
 
-            self._compiler_directives = kwargs.pop(
-                'cython_directives', self.default_cython_directives
-            )
+            if self._compiler == 'cython':
+                self._compiler_directives = kwargs.pop(
+                    'cython_directives', self.default_cython_directives
+                )
 
-            if not Cython:
-                raise ImportError('Cython library is not installed')
+                if not Cython:
+                    raise ImportError('Cython library is not installed')
 
-            rhs = _get_rhs(self._compiler,
-                           code_eqs,
-                           ydot=ydot,
-                           compiler_directives=self._compiler_directives
-                           )
+                rhs = _get_rhs(self._compiler,
+                               code_eqs,
+                               ydot=ydot,
+                               compiler_directives=self._compiler_directives
+                               )
 
-            with _set_cflags_no_warnings(self._logger):
+                with _set_cflags_no_warnings(self._logger):
+                    rhs(0.0, self.initials[0], self.param_values[0])
+            else:
+                if numba is None:
+                    raise ImportError('Numba library is not installed')
+
+                rhs = _get_rhs(self._compiler, code_eqs, ydot=ydot)
+
+                # Trigger JIT compilation now rather than mid-integration;
+                # the compiled function is memoized on the equation text
                 rhs(0.0, self.initials[0], self.param_values[0])
 
             self._code_eqs = code_eqs
@@ -212,7 +239,14 @@ class ScipyOdeSimulator(Simulator):
                                                        self.model.species)))
                                           + ',') + tuple(model.parameters)
 
-            self._code_eqs = (self._symbols, sympy.flatten(ode_mat))
+            # Lambdify only the reaction rate vector; the RHS factors as
+            # stoichiometry_matrix @ rates, so the (constant) matrix product
+            # is done in scipy.sparse rather than evaluating one scalar
+            # expression per species
+            self._code_eqs = (self._symbols,
+                              [rxn['rate'].subs(self._eqn_subs)
+                               for rxn in self._model.reactions],
+                              self.model.stoichiometry_matrix)
         else:
             raise ValueError('Unknown compiler_mode: %s' % self._compiler)
 
@@ -226,7 +260,7 @@ class ScipyOdeSimulator(Simulator):
                                for i in range(len(self._model.species))]
             jac_matrix = ode_mat.jacobian(species_symbols)
 
-            if self._compiler == 'cython':
+            if self._compiler in ('cython', 'numba'):
                 # Prepare the stringified Jacobian equations.
                 jac_eqs_list = []
                 for i in range(jac_matrix.shape[0]):
@@ -253,7 +287,10 @@ class ScipyOdeSimulator(Simulator):
                     jac=jac
                 )
 
-                with _set_cflags_no_warnings(self._logger):
+                if self._compiler == 'cython':
+                    with _set_cflags_no_warnings(self._logger):
+                        jac_fn(0.0, self.initials[0], self.param_values[0])
+                else:
                     jac_fn(0.0, self.initials[0], self.param_values[0])
                 self._jac_eqs = jac_eqs
             else:
@@ -479,6 +516,27 @@ class _DistutilsProxyLoggerAdapter(logging.LoggerAdapter):
     fatal = logging.LoggerAdapter.critical
 
 
+# JIT-compiled numba functions, memoized on the equation code text so that
+# repeated simulator construction for the same model (within a process) only
+# pays the compilation cost once
+_numba_fn_cache = {}
+
+
+def _compile_numba(code_eqs, out_name):
+    """JIT-compile assignment code into a function f(t, y, p, out)."""
+    try:
+        return _numba_fn_cache[code_eqs, out_name]
+    except KeyError:
+        pass
+    code = 'def _rhs(t, y, p, %s):\n    %s' % (
+        out_name, code_eqs.replace('\n', '\n    '))
+    namespace = {'math': math}
+    exec(code, namespace)
+    fn = numba.njit(namespace['_rhs'])
+    _numba_fn_cache[code_eqs, out_name] = fn
+    return fn
+
+
 def _get_rhs(compiler, code_eqs, ydot=None, jac=None, compiler_directives=None):
     if compiler == 'cython':
         if 'math.' in code_eqs:
@@ -490,6 +548,14 @@ def _get_rhs(compiler, code_eqs, ydot=None, jac=None, compiler_directives=None):
                           cython_compiler_directives=compiler_directives)
 
             return ydot if ydot is not None else jac
+    elif compiler == 'numba':
+        out = ydot if ydot is not None else jac
+        fn = _compile_numba(code_eqs, 'ydot' if ydot is not None else 'jac')
+
+        def rhs(t, y, p):
+            # the compiled code fills in the output array in place
+            fn(t, y, p, out)
+            return out
     else:
         def rhs(t, y, p):
             return code_eqs(*itertools.chain(y, p))
@@ -501,7 +567,11 @@ def _integrator_process(initials, param_values, code_eqs, jac_eqs, num_species,
                         integrator_name, compiler, integrator_opts, compiler_directives):
     """ Single integrator process, for parallel execution """
     if compiler == 'python':
-        code_eqs = sympy.lambdify(*code_eqs)
+        symbols, rate_exprs, stoich = code_eqs
+        rate_fn = sympy.lambdify(symbols, rate_exprs)
+
+        def code_eqs(*args):
+            return stoich @ np.asarray(rate_fn(*args))
         if jac_eqs:
             jac_eqs = sympy.lambdify(*jac_eqs)
 
@@ -510,10 +580,10 @@ def _integrator_process(initials, param_values, code_eqs, jac_eqs, num_species,
 
     jac_fn = None
     if jac_eqs:
-        jac_eqs = _get_rhs(compiler,
-                           jac_eqs,
-                           jac=np.zeros((num_odes, num_species)),
-                           compiler_directives=compiler_directives)
+        jac_fn = _get_rhs(compiler,
+                          jac_eqs,
+                          jac=np.zeros((num_odes, num_species)),
+                          compiler_directives=compiler_directives)
 
     # LSODA
     if integrator_name == 'lsoda':
@@ -536,7 +606,7 @@ def _integrator_process(initials, param_values, code_eqs, jac_eqs, num_species,
 
     # Set parameter vectors for RHS func and Jacobian
     integrator.set_f_params(param_values)
-    if jac_eqs:
+    if jac_fn is not None:
         integrator.set_jac_params(param_values)
 
     trajectory = np.ndarray((len(tspan), num_species))
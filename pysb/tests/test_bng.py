@@ -2,6 +2,7 @@ from pysb.testing import *
 from pysb import *
 from pysb.core import as_complex_pattern
 from pysb.bng import *
+from pysb.bng import _network_cache
 import os
 import unittest
 from nose.tools import assert_raises_regexp
@@ -23,6 +24,27 @@ def test_generate_network():
     ok_(generate_network(model))
 
 
+@with_model
+def test_generate_network_cache():
+    Monomer('A')
+    Parameter('A_0', 1)
+    Initial(A(), A_0)
+    Parameter('k', 1)
+    Rule('degrade', A() >> None, k)
+    clear_network_cache()
+    net1 = generate_network(model)
+    ok_(len(_network_cache) == 1)
+    # Repeated call with an unchanged model should hit the cache
+    ok_(generate_network(model) == net1)
+    ok_(len(_network_cache) == 1)
+    # Changing a parameter value should trigger re-generation
+    A_0.value = 2
+    ok_(generate_network(model) != net1)
+    ok_(len(_network_cache) == 2)
+    clear_network_cache()
+    ok_(not _network_cache)
+
+
 @unittest.skipIf(os.name == 'nt', 'BNG Console does not work on Windows')
 @with_model
 def test_simulate_network_console():
@@ -219,6 +241,25 @@ def test_fixed_species():
     assert num_non_zeros == 0
 
 
+@with_model
+def test_observables_matrix():
+    Monomer('A', ['b'])
+    Monomer('B', ['b'])
+    Initial(A(b=None), Parameter('A_0', 100))
+    Initial(B(b=None), Parameter('B_0', 50))
+    Rule('bind', A(b=None) + B(b=None) >> A(b=1) % B(b=1),
+         Parameter('kf', 1))
+    Observable('A_total', A())
+    Observable('AB', A(b=1) % B(b=1))
+    generate_equations(model)
+    obs_mat = model.observables_matrix
+    assert obs_mat.shape == (2, len(model.species))
+    for i, obs in enumerate(model.observables):
+        row = obs_mat.getrow(i)
+        assert sorted(zip(row.indices, row.data)) == \
+            sorted(zip(obs.species, obs.coefficients))
+
+
 @with_model
 def test_multistate():
     Monomer('A', ['a', 'a'], {'a': ['u', 'p']})
@@ -7,6 +7,10 @@ from pysb.simulator import ScipyOdeSimulator, InconsistentParameterError
 from pysb.examples import robertson, earm_1_0, tyson_oscillator, localfunc
 import unittest
 import pandas as pd
+try:
+    import numba
+except ImportError:
+    numba = None
 
 
 class TestScipySimulatorBase(object):
@@ -194,6 +198,13 @@ class TestScipyOdeCompilerTests(TestScipySimulatorBase):
         assert simres.species.shape[0] == self.args['tspan'].shape[0]
         assert np.allclose(self.python_res.dataframe, simres.dataframe)
 
+    @unittest.skipIf(numba is None, 'Numba not installed')
+    def test_numba(self):
+        sim = ScipyOdeSimulator(compiler='numba', **self.args)
+        simres = sim.run()
+        assert simres.species.shape[0] == self.args['tspan'].shape[0]
+        assert np.allclose(self.python_res.dataframe, simres.dataframe)
+
 
 class TestScipySimulatorSequential(TestScipySimulatorBase):
     def test_sequential_initials(self):
@@ -1,3 +1,5 @@
+from pysb import *
+from pysb.testing import with_model
 from pysb.export.stochkit import StochKitExporter
 from pysb.simulator import StochKitSimulator
 from pysb.examples import robertson, earm_1_0, expression_observables
@@ -12,6 +14,21 @@ def test_stochkit_export():
     StochKitExporter(robertson.model).export()
 
 
+@with_model
+def test_stochkit_export_dimerization():
+    Monomer('A', ['b'])
+    Parameter('kdim', 1e-3)
+    Parameter('A_0', 100)
+    # Expression rate forces a custom propensity function
+    Expression('e_kdim', kdim * 2)
+    Rule('dimerize', A(b=None) + A(b=None) >> A(b=1) % A(b=1), e_kdim)
+    Initial(A(b=None), A_0)
+    xml = StochKitExporter(model).export()
+    # __s0**2 should be rewritten to __s0*(__s0 - 1) for the SSA propensity
+    assert '__s0*(__s0 - 1)' in xml
+    assert 'pow(__s0' not in xml
+
+
 @raises(ValueError)
 def test_stochkit_invalid_init_kwarg():
     StochKitSimulator(earm_1_0.model, tspan=range(100), spam='eggs')